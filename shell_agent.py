@@ -5,22 +5,38 @@ import sys
 import pty
 import asyncio
 import uuid
-import json
 import argparse
 import shlex
 import traceback
-
-from fastapi import FastAPI, HTTPException
+import queue
+import threading
+import base64
+import time
+import itertools
+import signal
+import codecs
+import hashlib
+from collections import deque
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
+import orjson
 
 from prompt_toolkit import PromptSession, print_formatted_text
-from prompt_toolkit.formatted_text import ANSI
+from prompt_toolkit.formatted_text import ANSI, FormattedText
+from prompt_toolkit.history import History
 
-app = FastAPI(root_path="/gpt-shell")
+# the generated schema moves aside so the hand-written /openapi.json route
+# below is reachable; /docs and /redoc are built from the generated one
+app = FastAPI(root_path="/gpt-shell", default_response_class=ORJSONResponse,
+              openapi_url="/openapi.generated.json")
 
 quiet_mode = True
 require_confirmation = True
+log_background_output = False
 global_shell_session = None
 
 COLOR_WHITE = "\033[97m"
@@ -30,120 +46,604 @@ REMOTE_COLOR = "\033[38;2;223;155;255m"
 pending_local_attaches = asyncio.Queue()
 
 
-def get_prompt_text():
-    user = getpass.getuser()
-    hostname = socket.gethostname()
-    cwd = os.getcwd()
-    return f"{COLOR_WHITE}(sgpt){COLOR_RESET} {user}@{hostname}:{cwd}$ "
+# user and hostname don't change for the life of the process; only cwd does
+_USER = getpass.getuser()
+_HOST = socket.gethostname()
+# kept as bytes: it is written straight to stdout.buffer after every /run
+_PROMPT_PREFIX = f"{COLOR_WHITE}(sgpt){COLOR_RESET} {_USER}@{_HOST}:".encode()
+
+def get_prompt_bytes():
+    return _PROMPT_PREFIX + os.fsencode(os.getcwd()) + b"$ "
+
+# same prompt as get_prompt_bytes(), pre-split into styled fragments so
+# prompt_toolkit has no escape codes to tokenize
+_PROMPT_FRAGMENTS = [("ansiwhite", "(sgpt)"), ("", f" {_USER}@{_HOST}:")]
 
 def get_prompt():
-    return ANSI(get_prompt_text())
+    return FormattedText(_PROMPT_FRAGMENTS + [("", f"{os.getcwd()}$ ")])
+
+HISTORY_LIMIT = 1000
+
+class BoundedHistory(History):
+    """
+    Prompt history capped at maxlen entries. Every /run command is added to
+    it, so InMemoryHistory would grow (and be inserted into at the front)
+    for the life of the agent.
+    """
+    def __init__(self, maxlen: int = HISTORY_LIMIT):
+        super().__init__()
+        # newest first, as History expects; nothing to load from storage
+        self._loaded_strings = deque(maxlen=maxlen)
+        self._loaded = True
+
+    def load_history_strings(self):
+        return iter(self._loaded_strings)
+
+    def store_string(self, string: str):
+        pass
+
+    def append_string(self, string: str):
+        self._loaded_strings.appendleft(string)
+
+    def get_strings(self):
+        return list(reversed(self._loaded_strings))
 
 def force_ls_color(cmd: str) -> str:
-    parts = cmd.split()
-    if parts and parts[0] == "ls" and "--color" not in cmd:
-        parts.insert(1, "--color=always")
-        return " ".join(parts)
+    if (cmd.startswith("ls") and (len(cmd) == 2 or cmd[2].isspace())
+            and "--color" not in cmd):
+        return "ls --color=always" + cmd[2:]
     return cmd
 
+_INTERACTIVE_SHELLS = frozenset(("bash", "sh"))
+_INTERACTIVE_FLAGS = frozenset(("-it", "-i", "-t"))
+_QUOTE_CHARS = frozenset("'\"\\")
+
 def is_interactive(cmd: str) -> bool:
-    tokens = shlex.split(cmd)
+    # Most commands neither start with a shell nor carry -i/-t; reject those
+    # before tokenizing at all.
+    if (not cmd.lstrip().startswith(("bash", "sh"))
+            and "-i" not in cmd and "-t" not in cmd):
+        return False
+    # Whitespace splitting is enough unless quoting can hide a flag inside
+    # an argument; unbalanced quotes fall back to it as well.
+    tokens = None
+    if not _QUOTE_CHARS.isdisjoint(cmd):
+        try:
+            tokens = shlex.split(cmd)
+        except ValueError:
+            pass
+    if tokens is None:
+        tokens = cmd.split()
     if not tokens:
         return False
-    if tokens[0] in {"bash", "sh"} and "-c" not in tokens:
+    if tokens[0] in _INTERACTIVE_SHELLS and "-c" not in tokens:
         return True
     if tokens[0] == "sed":
         return False
-    if any(flag in tokens for flag in ["-it", "-i", "-t"]):
-        return True
-    return False
-    if tokens[0] in {"bash", "sh"} and "-c" not in tokens:
-        return True
-    if any(flag in tokens for flag in ["-it", "-i", "-t"]):
-        return True
-    return False
-    if tokens[0] in {"bash", "sh"}:
-        return True
-    if any(flag in tokens for flag in ["-it", "-i", "-t"]):
-        return True
-    return False
+    return not _INTERACTIVE_FLAGS.isdisjoint(tokens)
 
 # ------------------------------------------------------------------------------
 # CONFIRMATION QUEUE + ITEM
 # ------------------------------------------------------------------------------
 pending_confirmations = asyncio.Queue()
+CONFIRM_ANSWERS = frozenset(("y", "yes", ""))
 
 class ConfirmationItem:
-    def __init__(self, cmd: str, payload: dict, origin: str):
+    def __init__(self, cmd: str, stdin: str, origin: str):
         self.cmd = cmd
-        self.payload = payload
+        self.stdin = stdin
         self.origin = origin
-        loop = asyncio.get_event_loop()
-        self.future = loop.create_future()
+        self.future = asyncio.get_running_loop().create_future()
         self.id = str(uuid.uuid4())
 
+async def await_confirmation(request: Request, item: ConfirmationItem) -> bool:
+    """Queue item for the local user; withdraw it if the client disconnects."""
+    await pending_confirmations.put(item)
+    disconnect = asyncio.create_task(wait_disconnect(request))
+    try:
+        await asyncio.wait({item.future, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not item.future.done():
+            item.future.cancel()
+    return not item.future.cancelled() and item.future.result()
+
+async def wait_disconnect(request: Request):
+    # the body has already been read, so the next ASGI message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
 # ------------------------------------------------------------------------------
 # INTERACTIVE SESSION
 # ------------------------------------------------------------------------------
+class PtyWriter:
+    """
+    Input pump for a pty master. Writes are queued and a single task flushes
+    everything that has accumulated with one os.writev, so a pasted block or
+    a burst of input lines costs one syscall instead of one per line. If the
+    fd is non-blocking and the pty is full, it waits via loop.add_writer.
+    """
+    MAX_BATCH = 64
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def write(self, data: bytes):
+        self.queue.put_nowait(data)
+
+    def close(self):
+        self._task.cancel()
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.MAX_BATCH and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self._write_all(batch)
+            except OSError as e:
+                print(f"[sgpt] pty write error on fd {self.fd}: {e}")
+                return
+
+    async def _write_all(self, batch):
+        while batch:
+            try:
+                if hasattr(os, "writev"):
+                    n = os.writev(self.fd, batch)
+                else:
+                    n = os.write(self.fd, b"".join(batch))
+            except BlockingIOError:
+                await self._wait_writable()
+                continue
+            # drop what went out, keep the unwritten rest for the next round
+            while batch and n >= len(batch[0]):
+                n -= len(batch.pop(0))
+            if n:
+                batch[0] = batch[0][n:]
+
+    async def _wait_writable(self):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_writer(self.fd, ready.set_result, None)
+        try:
+            await ready
+        finally:
+            loop.remove_writer(self.fd)
+
 class InteractiveSession:
+    # keep at most this much unpolled output; older bytes are dropped
+    MAX_BUF = 1 << 20
+
     def __init__(self, session_id: str, master_fd: int, pid: int):
         self.session_id = session_id
         self.master_fd = master_fd
         self.pid = pid
-        self.output_buffer = ""
-        self._lock = asyncio.Lock()
-        self._read_task = asyncio.create_task(self._read_loop())
+        self.output_buffer = bytearray()
         self.attach_writer = None
-
-    async def _read_loop(self):
-        loop = asyncio.get_event_loop()
+        # True only while the local shell is attached; attach_writer stays set
+        # after a detach so output keeps buffering for /interactive/output
+        self.attached = False
+        self.last_active = time.monotonic()
+        self.finished_at = None
+        # keeps a multibyte character that straddles two reads intact
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        # set once the pty hits EOF or the session is killed
+        self.eof = asyncio.Event()
+        # wakes a long-polling get_output() when new bytes are buffered
+        self._data_ready = asyncio.Event()
+        # the pty is watched by the loop's selector directly: no executor
+        # thread is tied up per session, and reads never block
+        self._loop = asyncio.get_running_loop()
+        os.set_blocking(master_fd, False)
+        self._loop.add_reader(master_fd, self._on_readable)
+        # shared by /interactive/input and a locally attached terminal, so
+        # their writes are batched together and can't interleave mid-line
+        self.writer = PtyWriter(master_fd)
+
+    def _on_readable(self):
         while True:
             try:
-                data = await loop.run_in_executor(None, os.read, self.master_fd, 1024)
-                if not data:
-                    print(f"[interactive session {self.session_id}] EOF from PTY.")
-                    break
-                decoded = data.decode(errors="ignore")
-                if self.attach_writer:
-                    try:
-                        self.attach_writer.write(decoded)
-                        self.attach_writer.flush()
-                    except Exception as e:
-                        print(f"[interactive session {self.session_id}] attach_writer error: {e}")
-                if self.attach_writer:
-                    self.output_buffer += decoded
-            except Exception:
+                data = os.read(self.master_fd, READ_CHUNK_SIZE)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                # EIO is how Linux reports that the child side has gone away
                 print(f"[interactive session {self.session_id}] read error: {e}")
-                break
-
-    async def get_output(self) -> str:
-        async with self._lock:
-            out = self.output_buffer
-            self.output_buffer = ""
-            return out
+                self._stop_reading()
+                return
+            if not data:
+                print(f"[interactive session {self.session_id}] EOF from PTY.")
+                self._stop_reading()
+                return
+            if self.attached:
+                try:
+                    self.attach_writer.write(self._decoder.decode(data))
+                    defer_flush()
+                except Exception as e:
+                    print(f"[interactive session {self.session_id}] attach_writer error: {e}")
+            if self.attach_writer:
+                self.output_buffer.extend(data)
+                if len(self.output_buffer) > self.MAX_BUF:
+                    del self.output_buffer[:-self.MAX_BUF]
+                self._data_ready.set()
+
+    def _stop_reading(self):
+        self._loop.remove_reader(self.master_fd)
+        if self.finished_at is None:
+            self.finished_at = time.monotonic()
+        self.eof.set()
+        self._data_ready.set()
+
+    async def get_output(self, timeout: float = 0.0) -> str:
+        # with nothing buffered, wait up to timeout seconds for output so
+        # clients can long-poll instead of hammering the endpoint
+        if timeout > 0 and not self.output_buffer and not self.eof.is_set():
+            self._data_ready.clear()
+            try:
+                await asyncio.wait_for(self._data_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        # raw bytes are buffered and decoded here in one go, so multibyte
+        # characters split across PTY reads survive intact. Reads and this
+        # swap both run on the event loop thread, so no lock is needed.
+        self.last_active = time.monotonic()
+        buf, self.output_buffer = self.output_buffer, bytearray()
+        return buf.decode("utf-8", "replace")
 
     def write_input(self, input_str: str):
-        os.write(self.master_fd, input_str.encode())
+        self.last_active = time.monotonic()
+        self.writer.write(input_str.encode())
 
     def kill(self):
         try:
             os.kill(self.pid, 9)
         except Exception:
             pass
+        self._stop_reading()
+        self.writer.close()
         try:
             os.close(self.master_fd)
         except Exception:
             pass
-        self._read_task.cancel()
 
     async def attach(self):
         self.attach_writer = sys.stdout
+        self.attached = True
         return self.master_fd
-        self._read_task.cancel()
-        return self.master_fd
+
+    def detach(self):
+        self.attached = False
+        # the idle clock starts when the local shell lets go
+        self.last_active = time.monotonic()
 
 interactive_sessions = {}
 
+# ------------------------------------------------------------------------------
+# SUBPROCESS STREAMS
+# ------------------------------------------------------------------------------
+READ_CHUNK_SIZE = 65536
+# StreamReader buffer limit: pipes pause only once 2x this is buffered, and
+# any readline()/readuntil() caller can handle lines up to this long
+STREAM_LIMIT = 1 << 20
+PROCESS_OUTPUT_LIMIT = 8 << 20
+
+class ByteRing:
+    """
+    Bounded output buffer for background processes: keeps the last max_bytes
+    of output in one bytearray, trimming the front once the limit is passed.
+    Offsets are absolute positions in the stream, so pollers can keep asking
+    for "everything after N" even after older data has been dropped.
+    """
+    def __init__(self, max_bytes: int):
+        self.buf = bytearray()
+        self.max = max_bytes
+        self.truncated = False
+        # stream offset of buf[0]
+        self.start = 0
+
+    @property
+    def end(self):
+        return self.start + len(self.buf)
+
+    def append(self, chunk: bytes):
+        self.buf.extend(chunk)
+        excess = len(self.buf) - self.max
+        if excess > 0:
+            # bytearray trims from the front without moving the rest
+            del self.buf[:excess]
+            self.start += excess
+            self.truncated = True
+
+    def read_from(self, offset: int = 0):
+        """
+        Return (bytes from stream offset onward, next offset). Anything before
+        the oldest retained byte has been dropped and is silently skipped.
+        """
+        skip = min(max(offset - self.start, 0), len(self.buf))
+        with memoryview(self.buf) as view:
+            return bytes(view[skip:]), self.end
+
+    def text(self) -> str:
+        return self.buf.decode("utf-8", "replace")
+
+def write_raw(data: bytes):
+    # flush the text layer first so raw bytes don't overtake earlier print()s
+    sys.stdout.flush()
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+# Subprocess/pty echoes are flushed on a short timer instead of per read, so
+# a burst of small chunks reaches the terminal in one write(2). Our own
+# print()s are newline-terminated or flush=True, so nothing sits in the
+# text layer for these bytes to overtake.
+STDOUT_FLUSH_DELAY = 0.02
+_pending_flush = None
+
+def _flush_stdout():
+    global _pending_flush
+    _pending_flush = None
+    sys.stdout.flush()
+
+def defer_flush():
+    global _pending_flush
+    if _pending_flush is None:
+        _pending_flush = asyncio.get_running_loop().call_later(
+            STDOUT_FLUSH_DELAY, _flush_stdout)
+
+def echo_raw(data: bytes):
+    sys.stdout.buffer.write(data)
+    defer_flush()
+
+# background output logging is written by a dedicated thread so a chatty
+# process never blocks the event loop on terminal I/O
+LOG_Q = queue.SimpleQueue()
+
+def _log_writer():
+    while True:
+        write_raw(LOG_Q.get())
+
+def start_log_writer():
+    threading.Thread(target=_log_writer, name="sgpt-log", daemon=True).start()
+
+def decode_output(chunks) -> str:
+    return b"".join(chunks).decode("utf-8", "replace")
+
+_SHELL_META = frozenset("&|;<>()$`\\\"'*?[]{}~#!\n")
+
+def exec_argv(cmd: str):
+    """Return the argv to exec cmd directly, or None if it needs a shell."""
+    if not _SHELL_META.isdisjoint(cmd):
+        return None
+    return shlex.split(cmd) or None
+
+async def spawn_process(cmd: str, **kwargs):
+    """
+    Exec commands without shell syntax directly, saving the /bin/sh fork.
+    Anything else, or a command that fails to exec (builtins like cd, VAR=x
+    prefixes, missing binaries), goes through create_subprocess_shell so the
+    shell's own behaviour and error messages are preserved.
+    """
+    kwargs.setdefault("limit", STREAM_LIMIT)
+    argv = exec_argv(cmd)
+    process = None
+    if argv:
+        try:
+            process = await asyncio.create_subprocess_exec(*argv, **kwargs)
+        except OSError:
+            pass
+    if process is None:
+        process = await asyncio.create_subprocess_shell(cmd, **kwargs)
+    return process
+
+async def spawn_protocol(protocol_factory, cmd: str, **kwargs):
+    """Same as spawn_process, but for a SubprocessProtocol. Returns the protocol."""
+    loop = asyncio.get_running_loop()
+    argv = exec_argv(cmd)
+    transport = None
+    if argv:
+        try:
+            transport, protocol = await loop.subprocess_exec(protocol_factory, *argv, **kwargs)
+        except OSError:
+            pass
+    if transport is None:
+        transport, protocol = await loop.subprocess_shell(protocol_factory, cmd, **kwargs)
+    return protocol
+
+async def drain(stream, collector=None):
+    """
+    Pump a subprocess pipe in READ_CHUNK_SIZE reads until EOF, echoing each
+    chunk as-is. Raw chunks are appended to collector (decode when building
+    the response).
+    """
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        if collector is not None:
+            collector.append(chunk)
+        echo_raw(chunk)
+    sys.stdout.flush()
+
+STDIN_CHUNK_SIZE = 65536
+
+async def feed_stdin(writer, data: bytes):
+    """
+    Write data to a subprocess stdin in STDIN_CHUNK_SIZE pieces, draining in
+    between so a large payload neither balloons the transport buffer nor
+    holds up the rest of the loop. A child that stops reading early is fine.
+    """
+    view = memoryview(data)
+    try:
+        for i in range(0, len(view), STDIN_CHUNK_SIZE):
+            if writer.is_closing():
+                break
+            writer.write(view[i:i + STDIN_CHUNK_SIZE])
+            await writer.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    writer.close()
+
+class LineEcho:
+    """
+    Echo output as "label [id]: line", keeping the partial last line until
+    the rest of it arrives so lines split across reads print whole.
+    """
+    def __init__(self, label: str, proc_id: str):
+        self.prefix = f"{label} [{proc_id}]: ".encode()
+        self.newline = b"\n" + self.prefix
+        self.tail = b""
+
+    def feed(self, chunk: bytes):
+        # prefix every complete line in one replace() over the whole chunk
+        data = self.tail + chunk
+        cut = data.rfind(b"\n") + 1
+        self.tail = data[cut:]
+        if cut:
+            LOG_Q.put_nowait(self.prefix + data[:cut - 1].replace(b"\n", self.newline) + b"\n")
+
+    def close(self):
+        if self.tail:
+            LOG_Q.put_nowait(self.prefix + self.tail + b"\n")
+            self.tail = b""
+
+class ProtocolStdin:
+    """StreamWriter-style write/drain/close over a protocol-managed stdin pipe."""
+    def __init__(self, pipe, writable: asyncio.Event):
+        self.pipe = pipe
+        self.writable = writable
+
+    def write(self, data: bytes):
+        self.pipe.write(data)
+
+    def is_closing(self):
+        return self.pipe.is_closing()
+
+    async def drain(self):
+        if self.pipe.is_closing():
+            raise ConnectionResetError("stdin pipe closed")
+        await self.writable.wait()
+        # the event is also set when the pipe is lost, so look again
+        if self.pipe.is_closing():
+            raise ConnectionResetError("stdin pipe closed")
+
+    def close(self):
+        self.pipe.close()
+
+class PipeProcess(asyncio.SubprocessProtocol):
+    """
+    Process handle over the pipe transports: stdin with flow control, exit
+    tracking and signalling. Subclasses decide where output goes by
+    implementing pipe_data_received.
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.stdin = None
+        self._exited = asyncio.get_running_loop().create_future()
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        stdin_pipe = transport.get_pipe_transport(0)
+        if stdin_pipe is not None:
+            self.stdin = ProtocolStdin(stdin_pipe, self._writable)
+
+    # flow control for the stdin pipe, forwarded here by the transport
+    def pause_writing(self):
+        self._writable.clear()
+
+    def resume_writing(self):
+        self._writable.set()
+
+    def pipe_connection_lost(self, fd, exc):
+        if fd == 0:
+            # wake a writer paused on a child that stopped reading
+            self._writable.set()
+
+    def process_exited(self):
+        self._writable.set()
+        self._exited.set_result(self.transport.get_returncode())
+
+    def connection_lost(self, exc):
+        self._writable.set()
+
+    @property
+    def returncode(self):
+        return self.transport.get_returncode()
+
+    def terminate(self):
+        self.transport.terminate()
+
+    def kill(self):
+        self.transport.kill()
+
+    def close(self):
+        # releases the pipe transports once the handle is done with
+        self.transport.close()
+
+    async def wait(self):
+        return await asyncio.shield(self._exited)
+
+class BackgroundProcess(PipeProcess):
+    """
+    /start process handle. Output is delivered by the pipe transports via
+    pipe_data_received straight into the ByteRings, so there is no
+    StreamReader layer and no reader task per pipe.
+    """
+
+    def __init__(self, proc_id: str, stdout: ByteRing, stderr: ByteRing):
+        super().__init__()
+        self.buffers = {1: stdout, 2: stderr}
+        self.echoes = {}
+        if log_background_output:
+            self.echoes = {1: LineEcho("STDOUT", proc_id), 2: LineEcho("STDERR", proc_id)}
+        self.finished_at = None
+
+    def pipe_data_received(self, fd, data):
+        self.buffers[fd].append(data)
+        if fd in self.echoes:
+            self.echoes[fd].feed(data)
+
+    def pipe_connection_lost(self, fd, exc):
+        super().pipe_connection_lost(fd, exc)
+        if fd in self.echoes:
+            self.echoes[fd].close()
+
+    def process_exited(self):
+        self.finished_at = time.monotonic()
+        super().process_exited()
+
+class RunProcess(PipeProcess):
+    """
+    /run process handle: output chunks are collected into lists and echoed
+    as they arrive, straight from the pipe callbacks, so a command needs no
+    reader task per stream.
+    """
+
+    def __init__(self, stdout: list, stderr: list):
+        super().__init__()
+        self.chunks = {1: stdout, 2: stderr}
+        # the transport reports connection_lost only after the process has
+        # exited and every pipe is drained
+        self._done = asyncio.get_running_loop().create_future()
+
+    def pipe_data_received(self, fd, data):
+        self.chunks[fd].append(data)
+        echo_raw(data)
+
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        if not self._done.done():
+            self._done.set_result(None)
+
+    async def done(self):
+        await self._done
+        self.close()
+        return self.returncode
+
 # ------------------------------------------------------------------------------
 # LOCAL SHELL
 # ------------------------------------------------------------------------------
@@ -161,22 +661,28 @@ async def run_in_pty(cmd: str):
             print(f"Error exec'ing {cmd_parts}: {e}")
             os._exit(1)
     else:
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         session = global_shell_session
         stop_event = asyncio.Event()
+        writer = PtyWriter(master_fd)
 
-        async def read_pty():
-            while not stop_event.is_set():
+        def on_readable():
+            while True:
                 try:
-                    data = await loop.run_in_executor(None, os.read, master_fd, 1024)
-                    if not data:
-                        print(f"[interactive session {self.session_id}] EOF from PTY.")
-                        break
-                    sys.stdout.write(data.decode(errors="ignore"))
-                    sys.stdout.flush()
+                    data = os.read(master_fd, READ_CHUNK_SIZE)
+                except BlockingIOError:
+                    return
                 except OSError:
-                    break
-            stop_event.set()
+                    # EIO once the child has exited
+                    data = b""
+                if not data:
+                    loop.remove_reader(master_fd)
+                    stop_event.set()
+                    return
+                echo_raw(data)
+
+        os.set_blocking(master_fd, False)
+        loop.add_reader(master_fd, on_readable)
 
         async def write_pty():
             while not stop_event.is_set():
@@ -189,17 +695,22 @@ async def run_in_pty(cmd: str):
                     # Possibly forcibly exited
                     stop_event.set()
                     return
+                # queued separately; PtyWriter sends both in one writev
+                writer.write(user_input.encode())
                 if not user_input.endswith("\n"):
-                    user_input += "\n"
-                os.write(master_fd, user_input.encode())
+                    writer.write(b"\n")
 
         tasks = [
-            asyncio.create_task(read_pty()),
+            asyncio.create_task(stop_event.wait()),
             asyncio.create_task(write_pty()),
         ]
         await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
         for t in tasks:
             t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        loop.remove_reader(master_fd)
+        sys.stdout.flush()
+        writer.close()
         try:
             os.close(master_fd)
         except OSError:
@@ -213,25 +724,18 @@ async def attach_local(session_id: str):
         print(f"No such session: {session_id}")
         return
     pty_session = interactive_sessions[session_id]
-    master_fd = await pty_session.attach()
-    loop = asyncio.get_event_loop()
+    await pty_session.attach()
     local_session = global_shell_session
     stop_event = asyncio.Event()
+    writer = pty_session.writer
 
     print(f"[sgpt] Attaching local shell to session {session_id}...\n")
 
     async def read_pty():
-        while not stop_event.is_set():
-            try:
-                data = await loop.run_in_executor(None, os.read, master_fd, 1024)
-                if not data:
-                    print(f"[attach_local] EOF received. Stopping read.")
-                    break
-                sys.stdout.write(data.decode(errors="ignore"))
-                sys.stdout.flush()
-            except OSError as e:
-                print(f"[attach_local] OSError: {e}")
-                break
+        # the session's own reader echoes output once attached; reading the
+        # fd here as well would just race it for data
+        await pty_session.eof.wait()
+        print(f"[attach_local] EOF received. Stopping read.")
         stop_event.set()
 
     async def write_pty():
@@ -246,18 +750,22 @@ async def attach_local(session_id: str):
                 print("[attach_local] write_pty got None")
                 stop_event.set()
                 return
+            writer.write(user_input.encode())
             if not user_input.endswith("\n"):
-                user_input += "\n"
-            os.write(master_fd, user_input.encode())
+                writer.write(b"\n")
         print("[attach_local] write_pty exiting")
 
     tasks = [
         asyncio.create_task(read_pty()),
         asyncio.create_task(write_pty()),
     ]
-    await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
+    # EOF must not wait for the user to press enter: whichever side ends
+    # first cancels the other, which also tears down a pending prompt
+    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
     for t in tasks:
         t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    pty_session.detach()
 
     print(f"\n[sgpt] Detaching from session {session_id}.\n")
 
@@ -270,60 +778,69 @@ async def handle_pending_local_attaches():
 
 
 # ------------------------------------------------------------------------------
-# Interrupt-based real-time confirmations
+# Real-time confirmations
 # ------------------------------------------------------------------------------
-async def handle_pending_confirmations():
-    """
-    Background task: new items from pending_confirmations interrupt the user's
-    main prompt by calling session.app.exit(). Then the main loop sees them.
-    """
-    while True:
-        item = await pending_confirmations.get()
-        # forcibly exit the prompt so main loop can handle it
-        if global_shell_session and global_shell_session.app:
-            global_shell_session.app.exit()
-        # stash item in new_items for the main loop
-        new_items.append(item)
+async def confirm_item(session, item):
+    if item.future.done():
+        # the requesting client went away while the item was queued
+        return
+    print(f"\n[sgpt] GPT wants to run:\n    {item.cmd}\n")
+    prompt_task = asyncio.create_task(session.prompt_async("Confirm execution? [Y/n] "))
+    await asyncio.wait({prompt_task, item.future}, return_when=asyncio.FIRST_COMPLETED)
+    if item.future.done():
+        prompt_task.cancel()
+        await asyncio.gather(prompt_task, return_exceptions=True)
+        print("[sgpt] Request withdrawn by client.\n")
+        return
+    try:
+        answer = prompt_task.result()
+    except (EOFError, KeyboardInterrupt):
+        item.future.set_result(False)
+        return
+    if answer is None:
+        # forcibly exited, treat as no
+        item.future.set_result(False)
+        return
 
-new_items = []
+    if answer.strip().lower() in CONFIRM_ANSWERS:
+        print("[sgpt] Command confirmed.\n")
+        item.future.set_result(True)
+    else:
+        print("[sgpt] Command declined.\n")
+        item.future.set_result(False)
 
 async def interactive_shell():
     global global_shell_session
-    session = PromptSession()
+    session = PromptSession(history=BoundedHistory())
     global_shell_session = session
 
-    # Start background confirmations
-    asyncio.create_task(handle_pending_confirmations())
     asyncio.create_task(handle_pending_local_attaches())
 
+    # The user's prompt races the confirmation queue: whichever finishes
+    # first is handled, and an arriving confirmation cancels the prompt.
+    confirm_task = None
     while True:
-
-        # Drain new items (interrupt arrival)
-        while new_items:
-            item = new_items.pop(0)
-            print(f"\n[sgpt] GPT wants to run:\n    {item.cmd}\n")
-            try:
-                answer = await session.prompt_async("Confirm execution? [Y/n] ")
-            except (EOFError, KeyboardInterrupt):
-                item.future.set_result(False)
-                continue
-            if answer is None:
-                # forcibly exited, treat as no
-                item.future.set_result(False)
+        if confirm_task is None:
+            confirm_task = asyncio.create_task(pending_confirmations.get())
+        prompt_task = asyncio.create_task(session.prompt_async(message=get_prompt()))
+        done, _ = await asyncio.wait({prompt_task, confirm_task},
+                                     return_when=asyncio.FIRST_COMPLETED)
+
+        if confirm_task in done:
+            if prompt_task not in done:
+                prompt_task.cancel()
+                await asyncio.gather(prompt_task, return_exceptions=True)
+            await confirm_item(session, confirm_task.result())
+            confirm_task = None
+            if prompt_task.cancelled():
                 continue
 
-            if answer.strip().lower() in ("y", ""):
-                print("[sgpt] Command confirmed.\n")
-                item.future.set_result(True)
-            else:
-                print("[sgpt] Command declined.\n")
-                item.future.set_result(False)
-
         # Normal user prompt
         try:
-            user_input = await session.prompt_async(message=get_prompt())
+            user_input = prompt_task.result()
         except (EOFError, KeyboardInterrupt):
             print("Exiting SGPT shell.")
+            await cleanup_children()
             os._exit(0)
         except Exception as e:
             print(f"[sgpt] Unexpected prompt error: {e}")
@@ -340,6 +857,7 @@ async def interactive_shell():
 
         if user_input.lower() == "exit":
             print("Exiting SGPT shell.")
+            await cleanup_children()
             os._exit(0)
 
         if user_input.lower() == "getsessions":
@@ -383,22 +901,13 @@ async def interactive_shell():
 
         # otherwise, normal
         try:
-            process = await asyncio.create_subprocess_shell(
+            # both streams just go to the terminal, so let the kernel merge them
+            process = await spawn_process(
                 user_input,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            async def print_stream(stream):
-                while True:
-                    line = await stream.readline()
-                    if not line:
-                        break
-                    sys.stdout.write(line.decode())
-                    sys.stdout.flush()
-            await asyncio.gather(
-                print_stream(process.stdout),
-                print_stream(process.stderr)
+                stderr=asyncio.subprocess.STDOUT,
             )
+            await drain(process.stdout)
             await process.wait()
         except Exception as e:
             print(f"[sgpt] Error executing command: {e}")
@@ -406,29 +915,25 @@ async def interactive_shell():
 # ------------------------------------------------------------------------------
 # HTTP: INTERACTIVE ENDPOINTS
 # ------------------------------------------------------------------------------
-class ShellCommand(BaseModel):
-    command: str
-    stdin: str = ""
-
+_NEEDS_SHELL_CHARS = frozenset("><|;*$&")
 
-def normalize_command(cmd: str) -> str:
-    if cmd.startswith("sed "):
-        cmd = cmd.replace("-i ", "-i")
-    return cmd
 def needs_shell(cmd: str) -> bool:
     # skip wrapping if already using sh -c or bash -c
-    if any(cmd.strip().startswith(p) for p in ["sh -c", "bash -c"]):
+    if cmd.lstrip().startswith(("sh -c", "bash -c")):
         return False
-    return any(sym in cmd for sym in [">", "<", "|", ";", "*", "$", "&"])
+    return not _NEEDS_SHELL_CHARS.isdisjoint(cmd)
+
 
+class InteractiveStartPayload(BaseModel):
+    cmd: str = "bash"
 
 @app.post("/interactive/start")
-async def interactive_start(payload: dict):
+async def interactive_start(payload: InteractiveStartPayload):
     """
-    Start an interactive session. JSON can have { "cmd": "...", ... }.
+    Start an interactive session. JSON can have { "cmd": "..." }.
     If no cmd, defaults to 'bash'.
     """
-    raw_cmd = payload.get("cmd", "bash")
+    raw_cmd = payload.cmd or "bash"
     if needs_shell(raw_cmd):
         cmd_parts = ['sh', '-c', raw_cmd]
     else:
@@ -437,10 +942,9 @@ async def interactive_start(payload: dict):
     if not cmd_parts:
         cmd_parts = ["bash"]
 
-    print(f"[DEBUG] Launching interactive session with: {cmd_parts}")
-    print(f"raw_cmd: {raw_cmd}")
-    print(f"dict[command]: {dict["command"]}")
-
+    if not quiet_mode:
+        print(f"[DEBUG] Launching interactive session with: {cmd_parts}")
+        print(f"raw_cmd: {raw_cmd}")
 
     session_id = str(uuid.uuid4())
     pid, master_fd = pty.fork()
@@ -461,12 +965,14 @@ async def interactive_start(payload: dict):
         await pending_local_attaches.put(session_id)
         return {"session_id": session_id}
 
+MAX_OUTPUT_WAIT = 30
+
 @app.get("/interactive/output/{session_id}")
-async def interactive_output(session_id: str):
+async def interactive_output(session_id: str, wait: float = 1.0):
     if session_id not in interactive_sessions:
         raise HTTPException(status_code=404, detail="Session not found")
     pty_session = interactive_sessions[session_id]
-    out = await pty_session.get_output()
+    out = await pty_session.get_output(min(max(wait, 0.0), MAX_OUTPUT_WAIT))
     return {"output": out}
 
 class InputPayload(BaseModel):
@@ -492,11 +998,145 @@ async def interactive_kill(session_id: str):
 # ------------------------------------------------------------------------------
 # HTTP: NON-INTERACTIVE (/run, /start)
 # ------------------------------------------------------------------------------
+async def parse_shell_command(request: Request):
+    """
+    /run and /start only need two strings out of the body, so decode it with
+    orjson directly instead of validating a Pydantic model per request.
+    Returns (command, stdin).
+    """
+    try:
+        data = orjson.loads(await request.body())
+        command = data["command"]
+        stdin = data.get("stdin", "")
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        command = stdin = None
+    if not isinstance(command, str) or not isinstance(stdin, str):
+        raise HTTPException(status_code=422,
+                            detail="Body must be a JSON object with a string 'command' and optional string 'stdin'")
+    return command, stdin
+
+# parse_shell_command reads the raw body, so FastAPI can't infer it; declare
+# it for /openapi.generated.json and the /docs page built from it
+SHELL_COMMAND_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {
+            "type": "object",
+            "properties": {
+                "command": {"type": "string",
+                            "description": "The shell command to execute"},
+                "stdin": {"type": "string",
+                          "description": "Optional input to send to the command's stdin"},
+            },
+            "required": ["command"],
+        }}},
+    }
+}
+
 processes = {}
+# ids only need to be unique for this server's lifetime
+_next_id = itertools.count().__next__
+
+PROCESS_REAP_INTERVAL = 30
+PROCESS_RETENTION = 300
+# finished /start entries beyond this many are dropped oldest-first,
+# without waiting for PROCESS_RETENTION
+MAX_TRACKED_PROCESSES = 256
+# interactive sessions that are not attached locally and that nobody has
+# polled or written to for this long are killed
+SESSION_IDLE_TTL = 3600
+
+def forget_process(proc_id: str):
+    processes.pop(proc_id)["process"].close()
+
+def evict_finished_processes():
+    # dicts keep insertion order, so the first finished entries are the oldest
+    excess = len(processes) - MAX_TRACKED_PROCESSES
+    if excess <= 0:
+        return
+    finished = [proc_id for proc_id, proc in processes.items()
+                if proc["process"].returncode is not None]
+    for proc_id in finished[:excess]:
+        forget_process(proc_id)
 
-@app.post("/run")
-async def run_command(payload: ShellCommand):
-    cmd = payload.command.strip()
+async def reap_processes():
+    """
+    Background task: forget /start entries whose process exited more than
+    PROCESS_RETENTION seconds ago, and drop interactive sessions that have
+    ended or sat idle past SESSION_IDLE_TTL. Every mutation of `processes`
+    and `interactive_sessions` happens on the event loop thread, so no lock
+    is needed.
+    """
+    while True:
+        await asyncio.sleep(PROCESS_REAP_INTERVAL)
+        now = time.monotonic()
+        cutoff = now - PROCESS_RETENTION
+        for proc_id, proc in list(processes.items()):
+            finished_at = proc["process"].finished_at
+            if finished_at is not None and finished_at < cutoff:
+                forget_process(proc_id)
+
+        idle_cutoff = now - SESSION_IDLE_TTL
+        for sid, sess in list(interactive_sessions.items()):
+            if sess.finished_at is not None:
+                expired = sess.finished_at < cutoff
+            else:
+                expired = not sess.attached and sess.last_active < idle_cutoff
+            if expired:
+                sess.kill()
+                del interactive_sessions[sid]
+
+PROCESS_SHUTDOWN_GRACE = 5
+
+async def cleanup_children():
+    """Terminate /start processes and interactive sessions before we exit."""
+    running = [p["process"] for p in processes.values()
+               if p["process"].returncode is None]
+    for process in running:
+        process.terminate()
+    if running:
+        try:
+            await asyncio.wait_for(asyncio.gather(*(p.wait() for p in running)),
+                                   PROCESS_SHUTDOWN_GRACE)
+        except asyncio.TimeoutError:
+            for process in running:
+                if process.returncode is None:
+                    process.kill()
+            await asyncio.gather(*(p.wait() for p in running))
+    for sess in list(interactive_sessions.values()):
+        sess.kill()
+    interactive_sessions.clear()
+
+# uvicorn turns SIGTERM/SIGINT into a graceful shutdown, which runs this
+app.router.add_event_handler("shutdown", cleanup_children)
+
+async def stream_output(process, stdin_input):
+    """Yield merged output as it arrives, then an exit marker."""
+    feeder = None
+    if stdin_input:
+        feeder = asyncio.create_task(feed_stdin(process.stdin, stdin_input.encode()))
+    try:
+        while True:
+            chunk = await process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            echo_raw(chunk)
+            yield chunk
+        exit_code = await process.wait()
+        yield f"\n---EXIT---\n{exit_code}\n".encode()
+    finally:
+        # client went away mid-stream: don't leave the command running
+        if process.returncode is None:
+            process.kill()
+        if feeder is not None and not feeder.done():
+            feeder.cancel()
+        write_raw(b"\n" + get_prompt_bytes())
+
+@app.post("/run", openapi_extra=SHELL_COMMAND_BODY)
+async def run_command(request: Request, stream: bool = False,
+                      merge_streams: bool = False):
+    raw_cmd, stdin_input = await parse_shell_command(request)
+    cmd = raw_cmd.strip()
     if is_interactive(cmd):
         return {
             "stdout": "",
@@ -506,9 +1146,8 @@ async def run_command(payload: ShellCommand):
     cmd = force_ls_color(cmd)
 
     if require_confirmation:
-        item = ConfirmationItem(cmd, payload.dict(), "run")
-        await pending_confirmations.put(item)
-        decision = await item.future
+        item = ConfirmationItem(cmd, stdin_input, "run")
+        decision = await await_confirmation(request, item)
         if not decision:
             return {
                 "stdout": "",
@@ -517,52 +1156,52 @@ async def run_command(payload: ShellCommand):
             }
 
     print_formatted_text(ANSI(f"\n{REMOTE_COLOR}{cmd}{COLOR_RESET}"))
+    # stream mode always merges: one pipe keeps both streams in order
+    merged = stream or merge_streams
+    stdin_pipe = asyncio.subprocess.PIPE if stdin_input else None
+    stderr_pipe = asyncio.subprocess.STDOUT if merged else asyncio.subprocess.PIPE
+    global_shell_session.history.append_string(cmd)
     try:
-        process = await asyncio.create_subprocess_shell(
-            cmd,
-            stdin=asyncio.subprocess.PIPE if payload.stdin else None,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        if payload.stdin:
-            process.stdin.write(payload.stdin.encode())
-            await process.stdin.drain()
-            process.stdin.close()
+        if stream:
+            process = await spawn_process(
+                cmd,
+                stdin=stdin_pipe,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=stderr_pipe,
+            )
+            return StreamingResponse(stream_output(process, stdin_input),
+                                     media_type="application/octet-stream")
 
         stdout_data = []
         stderr_data = []
-
-        global_shell_session.history.append_string(cmd)
-
-        async def read_stream(stream, collector):
-            while True:
-                line = await stream.readline()
-                if not line:
-                    break
-                decoded = line.decode()
-                print(decoded.rstrip())
-                collector.append(decoded)
-
-        await asyncio.gather(
-            read_stream(process.stdout, stdout_data),
-            read_stream(process.stderr, stderr_data)
+        process = await spawn_protocol(
+            lambda: RunProcess(stdout_data, stderr_data),
+            cmd,
+            stdin=stdin_pipe,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=stderr_pipe,
         )
-        exit_code = await process.wait()
+        # output is collected by the pipe callbacks meanwhile, so feeding
+        # stdin first can't deadlock on a full output pipe
+        if stdin_input:
+            await feed_stdin(process.stdin, stdin_input.encode())
+        exit_code = await process.done()
 
-        print("\n" + get_prompt_text(), end='', flush=True)
+        write_raw(b"\n" + get_prompt_bytes())
         return {
-            "stdout": "".join(stdout_data),
-            "stderr": "".join(stderr_data),
+            "stdout": decode_output(stdout_data),
+            "stderr": decode_output(stderr_data),
             "exit_code": exit_code
         }
     except Exception as e:
         print(f"[sgpt] Exception during /run: {e}")
-        print("\n" + get_prompt_text(), end='', flush=True)
+        write_raw(b"\n" + get_prompt_bytes())
         return {"stdout": "", "stderr": str(e), "exit_code": -1}
 
-@app.post("/start")
-async def start_command(payload: ShellCommand):
-    cmd = payload.command.strip()
+@app.post("/start", openapi_extra=SHELL_COMMAND_BODY)
+async def start_command(request: Request):
+    raw_cmd, stdin_input = await parse_shell_command(request)
+    cmd = raw_cmd.strip()
     if is_interactive(cmd):
         return {
             "stdout": "",
@@ -570,20 +1209,22 @@ async def start_command(payload: ShellCommand):
             "exit_code": -1
         }
     cmd = force_ls_color(cmd)
-    stdin_input = payload.stdin
-    proc_id = str(uuid.uuid4())
+    proc_id = f"p{_next_id():x}"
 
     print(f"\n[sgpt] [START] Launching background process:\n{cmd}\n🆔 ID: {proc_id}")
 
     if require_confirmation:
-        item = ConfirmationItem(cmd, payload.dict(), "start")
-        await pending_confirmations.put(item)
-        decision = await item.future
+        item = ConfirmationItem(cmd, stdin_input, "start")
+        decision = await await_confirmation(request, item)
         if not decision:
             print("Background process declined by user.")
             return {"error": "Execution declined"}
 
-    process = await asyncio.create_subprocess_shell(
+    stdout_buffer = ByteRing(PROCESS_OUTPUT_LIMIT)
+    stderr_buffer = ByteRing(PROCESS_OUTPUT_LIMIT)
+
+    process = await spawn_protocol(
+        lambda: BackgroundProcess(proc_id, stdout_buffer, stderr_buffer),
         cmd,
         stdin=asyncio.subprocess.PIPE if stdin_input else None,
         stdout=asyncio.subprocess.PIPE,
@@ -591,30 +1232,14 @@ async def start_command(payload: ShellCommand):
     )
 
     if stdin_input:
-        process.stdin.write(stdin_input.encode())
-        await process.stdin.drain()
-        process.stdin.close()
-
-    stdout_buffer = []
-    stderr_buffer = []
-
-    async def stream_output(stream, buffer, label):
-        while True:
-            line = await stream.readline()
-            if not line:
-                break
-            decoded = line.decode()
-            print(f"{label} [{proc_id}]: {decoded.rstrip()}")
-            buffer.append(decoded)
-
-    asyncio.create_task(stream_output(process.stdout, stdout_buffer, "STDOUT"))
-    asyncio.create_task(stream_output(process.stderr, stderr_buffer, "STDERR"))
+        asyncio.create_task(feed_stdin(process.stdin, stdin_input.encode()))
 
     processes[proc_id] = {
         "process": process,
         "stdout": stdout_buffer,
         "stderr": stderr_buffer
     }
+    evict_finished_processes()
     return {"id": proc_id}
 
 @app.get("/output/{id}")
@@ -623,12 +1248,36 @@ async def get_output(id: str):
     if not proc:
         raise HTTPException(status_code=404, detail="Process not found")
     return {
-        "stdout": "".join(proc["stdout"]),
-        "stderr": "".join(proc["stderr"]),
+        "stdout": proc["stdout"].text(),
+        "stderr": proc["stderr"].text(),
+        "truncated": proc["stdout"].truncated or proc["stderr"].truncated,
         "running": proc["process"].returncode is None,
         "exit_code": proc["process"].returncode
     }
 
+@app.get("/output/{id}/{stream_name}")
+async def get_output_stream(id: str, stream_name: str, offset: Optional[int] = None):
+    """
+    Raw stdout/stderr of a background process. Without offset the whole
+    retained buffer is streamed as bytes; with offset only the data after it
+    is returned, base64-encoded, along with the offset to poll from next.
+    """
+    proc = processes.get(id)
+    if not proc:
+        raise HTTPException(status_code=404, detail="Process not found")
+    if stream_name not in ("stdout", "stderr"):
+        raise HTTPException(status_code=404, detail="Stream must be stdout or stderr")
+    ring = proc[stream_name]
+    if offset is None:
+        # stream a snapshot; the ring keeps changing underneath us
+        data, _ = ring.read_from()
+        return StreamingResponse(iter((data,)), media_type="application/octet-stream")
+    data, next_offset = ring.read_from(offset)
+    return {
+        "data": base64.b64encode(data).decode("ascii"),
+        "next_offset": next_offset
+    }
+
 @app.post("/kill/{id}")
 async def kill_process(id: str):
     proc = processes.get(id)
@@ -641,10 +1290,39 @@ async def kill_process(id: str):
         "exit_code": proc["process"].returncode
     }
 
+OPENAPI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openapi.json")
+
+def load_openapi():
+    """(Re)read openapi.json into memory; SIGHUP calls this to pick up edits."""
+    global _OPENAPI_BYTES, _OPENAPI_ETAG
+    with open(OPENAPI_PATH, "rb") as f:
+        data = f.read()
+    orjson.loads(data)  # refuse to serve a half-edited file
+    _OPENAPI_BYTES = data
+    _OPENAPI_ETAG = '"%s"' % hashlib.blake2s(data).hexdigest()
+
+def reload_openapi():
+    try:
+        load_openapi()
+        print("[sgpt] Reloaded openapi.json")
+    except (OSError, orjson.JSONDecodeError) as e:
+        print(f"[sgpt] Keeping the previous openapi.json: {e}")
+
+load_openapi()
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match check: "*", or any listed tag under weak comparison."""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
 @app.get("/openapi.json")
-async def get_openapi():
-    with open("openapi.json", "r") as f:
-        return json.load(f)
+async def get_openapi(request: Request):
+    headers = {"ETag": _OPENAPI_ETAG}
+    if etag_matches(request.headers.get("if-none-match", ""), _OPENAPI_ETAG):
+        return Response(status_code=304, headers=headers)
+    return Response(content=_OPENAPI_BYTES, media_type="application/json",
+                    headers=headers)
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Shell Automation Agent")
@@ -652,6 +1330,8 @@ def parse_args():
                         help="Disable confirmation prompts before command execution")
     parser.add_argument("--no-quiet", action="store_true",
                         help="Enable uvicorn logging output (by default uvicorn logs are suppressed)")
+    parser.add_argument("--log-output", action="store_true",
+                        help="Echo the output of background (/start) processes to the terminal")
     return parser.parse_args()
 
 async def serve_uvicorn(uvicorn_log_level):
@@ -665,15 +1345,27 @@ async def serve_uvicorn(uvicorn_log_level):
 
 async def main():
     args = parse_args()
-    global require_confirmation, quiet_mode
+    global require_confirmation, quiet_mode, log_background_output
     require_confirmation = not args.no_confirm
     quiet_mode = False if args.no_quiet else True
+    log_background_output = args.log_output
+    if log_background_output:
+        start_log_writer()
     uvicorn_log_level = "info" if not quiet_mode else "critical"
+    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_openapi)
 
     await asyncio.gather(
         serve_uvicorn(uvicorn_log_level),
-        interactive_shell()
+        interactive_shell(),
+        reap_processes()
     )
 
 if __name__ == "__main__":
+    # uvloop is a faster drop-in for the subprocess/pty pipe workload; the
+    # policy has to be set before asyncio.run creates the loop
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main())